@@ -16,6 +16,8 @@ ffibuilder.cdef("""
         int cycle_count;
         bool is_charging;
         bool is_plugged_in;
+        int amperage;
+        bool has_amperage;
     } BatteryInfo;
 
     BatteryInfo FetchBatteryInfo(void);
@@ -13,6 +13,7 @@ static const char kDesignCapacityKey[] = "DesignCapacity";
 static const char kCycleCountKey[] = "CycleCount";
 static const char kIsChargingKey[] = "IsCharging";
 static const char kExternalConnectedKey[] = "ExternalConnected";
+static const char kAmperageKey[] = "Amperage";
 
 static bool GetDictInt(CFDictionaryRef dict, const char* key, void* out,
                        CFNumberType type) {
@@ -77,6 +78,9 @@ BatteryInfo FetchBatteryInfo(void) {
   if (!GetDictBool(properties, kExternalConnectedKey, &info.is_plugged_in))
     fprintf(stderr, "batterytool: failed to read IOKit key '%s'\n",
             kExternalConnectedKey);
+  // Optional: the energy ledger falls back to capacity deltas without it
+  info.has_amperage =
+      GetDictInt(properties, kAmperageKey, &info.amperage, kCFNumberIntType);
 
   CFRelease(properties);
   return info;
@@ -12,6 +12,8 @@ typedef struct {
   int cycle_count;
   bool is_charging;
   bool is_plugged_in;
+  int amperage;      /* mA, negative while discharging */
+  bool has_amperage; /* false if the battery doesn't report it */
 } BatteryInfo;
 
 BatteryInfo FetchBatteryInfo(void);
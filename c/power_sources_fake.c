@@ -5,7 +5,9 @@
  * per line:
  *
  *   <current_mAh> <max_mAh> <design_mAh> <cycle_count> <is_charging>
- * <is_plugged_in>
+ * <is_plugged_in> [<amperage_mA>]
+ *
+ * The amperage column is optional; without it has_amperage is false
  *
  * Each call consumes the row at the position stored in battery_cursor
  * (created on first call), so a test can script a sequence of readings
@@ -77,11 +79,13 @@ BatteryInfo FetchBatteryInfo(void) {
   /* Past the end of the script, keep returning the final row. */
   const char* row = selected[0] != '\0' ? selected : last;
   int charging = 0, plugged = 0;
-  if (sscanf(row, "%d %d %d %d %d %d", &info.current_capacity,
-             &info.max_capacity, &info.design_capacity, &info.cycle_count,
-             &charging, &plugged) == 6) {
+  int fields = sscanf(row, "%d %d %d %d %d %d %d", &info.current_capacity,
+                      &info.max_capacity, &info.design_capacity,
+                      &info.cycle_count, &charging, &plugged, &info.amperage);
+  if (fields >= 6) {
     info.is_charging = charging != 0;
     info.is_plugged_in = plugged != 0;
+    info.has_amperage = fields == 7;
   }
 
   write_cursor(dir, cursor + 1);
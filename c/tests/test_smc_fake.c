@@ -149,6 +149,26 @@ static void TestBatteryScriptYieldsRowsInOrderThenRepeatsLast(void** state) {
   assert_int_equal(third.current_capacity, 4);
 }
 
+static void TestBatteryScriptAmperageIsOptional(void** state) {
+  (void)state;
+
+  WriteFile("battery_script",
+            "96 100 100 10 1 1 1500\n50 100 100 10 0 1 0\n50 100 100 10 0 1\n");
+
+  BatteryInfo first = FetchBatteryInfo();
+  assert_int_equal(first.amperage, 1500);
+  assert_true(first.has_amperage);
+
+  /* A real 0 mA reading is still a reading */
+  BatteryInfo second = FetchBatteryInfo();
+  assert_int_equal(second.amperage, 0);
+  assert_true(second.has_amperage);
+
+  BatteryInfo third = FetchBatteryInfo();
+  assert_int_equal(third.current_capacity, 50);
+  assert_false(third.has_amperage);
+}
+
 static void TestMissingBatteryScriptReturnsZeros(void** state) {
   (void)state;
 
@@ -170,6 +190,7 @@ int main(void) {
       FAKE_TEST(TestWriteUnknownKeyFailsAndIsNotLogged),
       FAKE_TEST(TestWriteWrongSizeFails),
       FAKE_TEST(TestBatteryScriptYieldsRowsInOrderThenRepeatsLast),
+      FAKE_TEST(TestBatteryScriptAmperageIsOptional),
       FAKE_TEST(TestMissingBatteryScriptReturnsZeros),
   };
 
@@ -12,7 +12,17 @@ DEV_DEPS = nox.project.dependency_groups(PYPROJECT, "dev")
 def tests(session):
     session.install(".")
     session.install(*DEV_DEPS)
-    session.run("python", "-m", "pytest", *session.posargs)
+    # One xdist worker per core: each worker is its own process, so the fake
+    # backend's env vars and tmp dirs never leak between parallel tests
+    session.run("python", "-m", "pytest", "-n", "auto", *session.posargs)
+
+
+@nox.session(python=PYTHON_VERSIONS)
+def soak(session):
+    """Millions of polls per layout; run before a release"""
+    session.install(".")
+    session.install(*DEV_DEPS)
+    session.run("python", "-m", "pytest", "-n", "auto", "-m", "soak", "--soak-iterations", "2000000", *session.posargs)
 
 
 @nox.session
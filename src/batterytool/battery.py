@@ -40,10 +40,17 @@ Tahoe keys (macOS 15.7+):
 
   Not all Tahoe machines expose the same keys. I detect which keys
   are available at runtime by attempting to read each one
+
+Linux:
+
+  There is no SMC, so the sysfs backend (see sysfs.py) maps the legacy keys onto
+  /sys/class/power_supply/BAT*. Tahoe keys never exist there, so Linux always
+  runs the legacy loop
 """
 
 import os
 import platform
+import sys
 
 from batterytool.constants import SMCKeys, SMCValues
 
@@ -51,12 +58,14 @@ from batterytool.constants import SMCKeys, SMCValues
 # so the whole package can run in tests/CI/VMs without touching the SMC
 if os.environ.get("BATTERYTOOL_FAKE"):
     from batterytool.iokit_wrapper_fake import ffi, lib
+elif sys.platform == "linux":
+    from batterytool.sysfs import ffi, lib
 else:
     from batterytool.iokit_wrapper import ffi, lib
 
 
 def fetch_battery_info():
-    """Fetch current battery info from IOKit via CFFI"""
+    """Fetch current battery info from IOKit via CFFI (or sysfs on Linux)"""
     return lib.FetchBatteryInfo()
 
 
@@ -65,6 +74,11 @@ def is_apple_silicon() -> bool:
     return platform.machine() == "arm64"
 
 
+def is_linux() -> bool:
+    """Check if I'm running on Linux, where the sysfs backend is used"""
+    return sys.platform == "linux"
+
+
 def is_tahoe() -> bool:
     """Check if I'm on a Tahoe mac (macOS 15.7+) by trying to read the CHTE key"""
     buf = ffi.new("char[32]")
@@ -1,10 +1,17 @@
 from enum import Enum
+from pathlib import Path
 
 DEFAULT_TARGET_HEALTH = 79
 DEFAULT_MAX_CHARGE = 95
 DEFAULT_MIN_CHARGE = 5
 DEFAULT_POLLING_INTERVAL = 60
 
+DEFAULT_HISTORY_DB = Path("battery-history.db")
+DEFAULT_KEEP_RAW_DAYS = 30
+DEFAULT_KEEP_MINUTE_DAYS = 365
+DEFAULT_KEEP_HOUR_DAYS = None
+DEFAULT_KEEP_TRANSITION_DAYS = None
+
 
 class SMCKeys(bytes, Enum):
     """SMC key names for battery charging control"""
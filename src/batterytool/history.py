@@ -0,0 +1,430 @@
+"""
+Fleet history store
+
+Every machine writes its own JSON log via --log-file. This module ingests those
+logs into one SQLite database so fleet questions ("health over time for every
+Mac still above 85%") are answered with an index lookup instead of re-parsing
+every file
+
+  readings      raw battery_reading events, unique on (machine, ts)
+  transitions   charging_disabled/charging_enabled/target_reached/cleanup events,
+                unique on (machine, ts, event)
+  rollups       per-minute and per-hour aggregates, updated incrementally on ingest
+  machines      latest reading per machine, for fleet-wide filters
+  log_files     byte offset already ingested per file, so ingest resumes where
+                it stopped. Offsets are committed in the same transaction as
+                the rows they cover, so a crash never double-counts a line.
+                A file counts as the same file while its first line is, so
+                copies that replace the inode (rsync, scp, cp then rename)
+                resume too. Re-reading a file is harmless anyway: rows that
+                are already stored are ignored, and only new rows are rolled up
+
+The machine name is the log file's name up to ".log", so mbp-lab-3.log and
+its rotations (mbp-lab-3.log.1, mbp-lab-3.log-20260101) are all "mbp-lab-3".
+Files are parsed in a process pool; all writes go through a single connection
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from batterytool.constants import (
+    DEFAULT_KEEP_HOUR_DAYS,
+    DEFAULT_KEEP_MINUTE_DAYS,
+    DEFAULT_KEEP_RAW_DAYS,
+    DEFAULT_KEEP_TRANSITION_DAYS,
+)
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# ".log" ending the name or followed by a logrotate suffix (".1", "-20260101")
+LOG_SUFFIX = re.compile(r"\.log(?=$|[.-])")
+
+TRANSITION_EVENTS = frozenset({"charging_disabled", "charging_enabled", "target_reached", "cleanup"})
+
+# Upper bound on bytes parsed per file per round, so a years-long log never
+# has to fit in memory at once
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_files (
+    path TEXT PRIMARY KEY,
+    machine TEXT NOT NULL,
+    head TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS readings (
+    machine TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    battery_percentage REAL NOT NULL,
+    battery_health REAL NOT NULL,
+    cycle_count INTEGER NOT NULL,
+    charging_enabled INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS readings_machine_ts ON readings (machine, ts);
+CREATE INDEX IF NOT EXISTS readings_ts ON readings (ts);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    machine TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    battery_percentage REAL,
+    battery_health REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS transitions_machine_ts ON transitions (machine, ts, event);
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    health_sum REAL NOT NULL,
+    health_min REAL NOT NULL,
+    health_max REAL NOT NULL,
+    percentage_sum REAL NOT NULL,
+    percentage_min REAL NOT NULL,
+    percentage_max REAL NOT NULL,
+    cycle_count INTEGER NOT NULL,
+    PRIMARY KEY (resolution, machine, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollups_resolution_bucket ON rollups (resolution, bucket);
+
+CREATE TABLE IF NOT EXISTS machines (
+    machine TEXT PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    battery_percentage REAL NOT NULL,
+    battery_health REAL NOT NULL,
+    cycle_count INTEGER NOT NULL
+);
+"""
+
+UPSERT_ROLLUP = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, machine, bucket) DO UPDATE SET
+    samples = samples + excluded.samples,
+    health_sum = health_sum + excluded.health_sum,
+    health_min = min(health_min, excluded.health_min),
+    health_max = max(health_max, excluded.health_max),
+    percentage_sum = percentage_sum + excluded.percentage_sum,
+    percentage_min = min(percentage_min, excluded.percentage_min),
+    percentage_max = max(percentage_max, excluded.percentage_max),
+    cycle_count = max(cycle_count, excluded.cycle_count)
+"""
+
+UPSERT_MACHINE = """
+INSERT INTO machines VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (machine) DO UPDATE SET
+    ts = excluded.ts,
+    battery_percentage = excluded.battery_percentage,
+    battery_health = excluded.battery_health,
+    cycle_count = excluded.cycle_count
+WHERE excluded.ts >= machines.ts
+"""
+
+# (ts, battery_percentage, battery_health, cycle_count, charging_enabled)
+Reading = tuple[int, float, float, int, int]
+# (ts, event, battery_percentage, battery_health)
+Transition = tuple[int, str, float | None, float | None]
+
+
+@dataclass(frozen=True)
+class Retention:
+    """How many days of each resolution to keep; None keeps everything"""
+
+    raw_days: int | None = DEFAULT_KEEP_RAW_DAYS
+    minute_days: int | None = DEFAULT_KEEP_MINUTE_DAYS
+    hour_days: int | None = DEFAULT_KEEP_HOUR_DAYS
+    # Transitions are never rolled up, so they default to kept forever
+    transition_days: int | None = DEFAULT_KEEP_TRANSITION_DAYS
+
+
+@dataclass(frozen=True)
+class LogChunk:
+    """Events parsed from one file between two byte offsets"""
+
+    path: str
+    head: str
+    offset: int
+    readings: list[Reading]
+    transitions: list[Transition]
+    more: bool
+
+
+def open_store(db: Path) -> sqlite3.Connection:
+    """Open (and create if needed) the history database"""
+    conn = sqlite3.connect(db)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def machine_name(path: Path) -> str:
+    """Machine a log file belongs to: its name up to ".log", or its stem without one"""
+    match = LOG_SUFFIX.search(path.name)
+    return path.name[: match.start()] if match is not None else path.stem
+
+
+def read_log(path: str, offset: int, head: str, max_bytes: int = MAX_CHUNK_BYTES) -> LogChunk:
+    """Parse complete lines from path starting at offset
+
+    Restarts from 0 if the file was rotated (its first line no longer hashes
+    to head) or truncated. A trailing partial line, e.g. one the tool is
+    still writing, is left for the next ingest. Lines that aren't JSON
+    events, or events with missing or malformed fields, are skipped
+    """
+    with open(path, "rb") as f:
+        current_head = _head(f.readline())
+        if current_head != head or os.fstat(f.fileno()).st_size < offset:
+            offset = 0
+        f.seek(offset)
+        data = f.read(max_bytes)
+
+    end = data.rfind(b"\n") + 1
+    readings: list[Reading] = []
+    transitions: list[Transition] = []
+    for line in data[:end].splitlines():
+        event = _parse_line(line)
+        if event is None:
+            continue
+        try:
+            ts = int(datetime.fromisoformat(event["timestamp"]).timestamp())
+            name = event["event"]
+            if name == "battery_reading":
+                readings.append(
+                    (
+                        ts,
+                        float(event["battery_percentage"]),
+                        float(event["battery_health"]),
+                        int(event["cycle_count"]),
+                        int(bool(event["charging_enabled"])),
+                    )
+                )
+            elif name in TRANSITION_EVENTS:
+                transitions.append((ts, name, event.get("battery_percentage"), event.get("current_health")))
+        except (KeyError, TypeError, ValueError):
+            # A missing or malformed field skips the line, like a non-JSON one,
+            # so one bad event can't pin the file's offset forever
+            continue
+
+    return LogChunk(
+        path=path,
+        head=current_head,
+        offset=offset + end,
+        readings=readings,
+        transitions=transitions,
+        more=end > 0 and len(data) == max_bytes,
+    )
+
+
+def _head(first_line: bytes) -> str:
+    """Identity of a log file: the hash of its first complete line, or "" before it has one"""
+    return hashlib.sha256(first_line).hexdigest() if first_line.endswith(b"\n") else ""
+
+
+def _parse_line(line: bytes) -> dict[str, Any] | None:
+    """Decode one JSON log line, skipping anything that isn't a timestamped event"""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(event, dict) or "timestamp" not in event or "event" not in event:
+        return None
+    return event  # pyright: ignore[reportUnknownVariableType]
+
+
+def ingest(
+    conn: sqlite3.Connection,
+    log_files: list[Path],
+    max_workers: int | None = None,
+    max_bytes: int = MAX_CHUNK_BYTES,
+) -> tuple[int, int]:
+    """Incrementally ingest log files, parsing them concurrently
+
+    Returns:
+        (readings, transitions) stored by this call
+    """
+    pending = {str(path.resolve()) for path in log_files}
+    stored_readings = 0
+    stored_transitions = 0
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending:
+            futures = [pool.submit(read_log, path, *_resume_point(conn, path), max_bytes) for path in pending]
+            pending = set[str]()
+            for future in as_completed(futures):
+                chunk = future.result()
+                readings, transition_count = _store(conn, chunk)
+                stored_readings += readings
+                stored_transitions += transition_count
+                if chunk.more:
+                    pending.add(chunk.path)
+
+    return stored_readings, stored_transitions
+
+
+def _resume_point(conn: sqlite3.Connection, path: str) -> tuple[int, str]:
+    """(offset, head) already ingested for path, or (0, "") if it's new"""
+    row = conn.execute("SELECT offset, head FROM log_files WHERE path = ?", (path,)).fetchone()
+    return (row["offset"], row["head"]) if row is not None else (0, "")
+
+
+def _store(conn: sqlite3.Connection, chunk: LogChunk) -> tuple[int, int]:
+    """Write one chunk and its new offset atomically
+
+    Returns:
+        (readings, transitions) actually inserted; rows already stored are skipped
+    """
+    machine = machine_name(Path(chunk.path))
+
+    with conn:
+        readings = [
+            reading
+            for reading in chunk.readings
+            if conn.execute("INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?, ?, ?)", (machine, *reading)).rowcount
+        ]
+        transition_count = sum(
+            conn.execute("INSERT OR IGNORE INTO transitions VALUES (?, ?, ?, ?, ?)", (machine, *transition)).rowcount
+            for transition in chunk.transitions
+        )
+        conn.executemany(UPSERT_ROLLUP, _rollups(machine, readings))
+        if readings:
+            ts, percentage, health, cycle_count, _ = max(readings)
+            conn.execute(UPSERT_MACHINE, (machine, ts, percentage, health, cycle_count))
+        conn.execute(
+            "INSERT OR REPLACE INTO log_files VALUES (?, ?, ?, ?)",
+            (chunk.path, machine, chunk.head, chunk.offset),
+        )
+    return len(readings), transition_count
+
+
+def _rollups(machine: str, readings: list[Reading]) -> list[tuple[Any, ...]]:
+    """Pre-aggregate a chunk's readings into minute and hour buckets"""
+    buckets: dict[tuple[int, int], list[Any]] = {}
+    for ts, percentage, health, cycle_count, _ in readings:
+        for resolution in (MINUTE, HOUR):
+            key = (resolution, ts - ts % resolution)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, health, health, health, percentage, percentage, percentage, cycle_count]
+                continue
+            bucket[0] += 1
+            bucket[1] += health
+            bucket[2] = min(bucket[2], health)
+            bucket[3] = max(bucket[3], health)
+            bucket[4] += percentage
+            bucket[5] = min(bucket[5], percentage)
+            bucket[6] = max(bucket[6], percentage)
+            bucket[7] = max(bucket[7], cycle_count)
+    return [(resolution, machine, start, *bucket) for (resolution, start), bucket in buckets.items()]
+
+
+def prune(conn: sqlite3.Connection, retention: Retention, now: int) -> None:
+    """Drop raw readings, transitions and rollups older than their retention window"""
+    with conn:
+        if retention.raw_days is not None:
+            conn.execute("DELETE FROM readings WHERE ts < ?", (now - retention.raw_days * DAY,))
+        if retention.transition_days is not None:
+            conn.execute("DELETE FROM transitions WHERE ts < ?", (now - retention.transition_days * DAY,))
+        for resolution, days in ((MINUTE, retention.minute_days), (HOUR, retention.hour_days)):
+            if days is not None:
+                conn.execute(
+                    "DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                    (resolution, now - days * DAY),
+                )
+
+
+def machines(conn: sqlite3.Connection, min_health: float | None = None) -> list[dict[str, Any]]:
+    """Latest reading per machine, optionally only those still above min_health"""
+    rows = conn.execute(
+        "SELECT * FROM machines WHERE battery_health > coalesce(?, -1) ORDER BY machine",
+        (min_health,),
+    )
+    return [dict(row) for row in rows]
+
+
+def health_history(
+    conn: sqlite3.Connection,
+    resolution: int,
+    machine: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+    min_health: float | None = None,
+) -> list[dict[str, Any]]:
+    """Battery health over time, from raw readings (resolution 0) or a rollup
+
+    Args:
+        conn: Open history store
+        resolution: 0 for raw readings, MINUTE or HOUR for rollups
+        machine: Only this machine
+        since: Earliest epoch second to include
+        until: Latest epoch second to include
+        min_health: Only machines whose latest health is still above this %
+    """
+    if resolution == 0:
+        where, params = _filters("ts", machine, since, until, min_health)
+        query = f"""
+            SELECT machine, ts, battery_health, battery_percentage, cycle_count
+            FROM readings {where} ORDER BY machine, ts
+        """
+    else:
+        where, params = _filters("bucket", machine, since, until, min_health)
+        query = f"""
+            SELECT machine, bucket AS ts, samples,
+                health_sum / samples AS battery_health, health_min, health_max,
+                percentage_sum / samples AS battery_percentage, percentage_min, percentage_max,
+                cycle_count
+            FROM rollups {where} AND resolution = ? ORDER BY machine, bucket
+        """
+        params.append(resolution)
+
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def transitions(
+    conn: sqlite3.Connection,
+    machine: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+) -> list[dict[str, Any]]:
+    """Charging transitions in time order"""
+    where, params = _filters("ts", machine, since, until)
+    rows = conn.execute(f"SELECT * FROM transitions {where} ORDER BY machine, ts, rowid", params)
+    return [dict(row) for row in rows]
+
+
+def _filters(
+    ts_column: str,
+    machine: str | None,
+    since: int | None,
+    until: int | None,
+    min_health: float | None = None,
+) -> tuple[str, list[Any]]:
+    """WHERE clause for the given filters, only naming columns that are set so the indexes apply"""
+    clauses = ["1 = 1"]
+    params: list[Any] = []
+    if machine is not None:
+        clauses.append("machine = ?")
+        params.append(machine)
+    if since is not None:
+        clauses.append(f"{ts_column} >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append(f"{ts_column} <= ?")
+        params.append(until)
+    if min_health is not None:
+        clauses.append("machine IN (SELECT machine FROM machines WHERE battery_health > ?)")
+        params.append(min_health)
+    return "WHERE " + " AND ".join(clauses), params
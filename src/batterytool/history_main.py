@@ -0,0 +1,143 @@
+import json
+import time
+from datetime import UTC, datetime
+from enum import Enum
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+
+from batterytool.constants import (
+    DEFAULT_HISTORY_DB,
+    DEFAULT_KEEP_HOUR_DAYS,
+    DEFAULT_KEEP_MINUTE_DAYS,
+    DEFAULT_KEEP_RAW_DAYS,
+    DEFAULT_KEEP_TRANSITION_DAYS,
+)
+from batterytool.history import (
+    HOUR,
+    MINUTE,
+    Retention,
+    health_history,
+    ingest,
+    machines,
+    open_store,
+    prune,
+    transitions,
+)
+from batterytool.logging import setup_logging
+
+app = typer.Typer(help="BatteryTool history - Query battery logs from a fleet of machines")
+
+DbOption = Annotated[Path, typer.Option("--db", help="History database file")]
+MachineOption = Annotated[str | None, typer.Option("--machine", help="Only this machine (log file stem)")]
+SinceOption = Annotated[datetime | None, typer.Option("--since", help="Earliest time to include (UTC)")]
+UntilOption = Annotated[datetime | None, typer.Option("--until", help="Latest time to include (UTC)")]
+MinHealthOption = Annotated[
+    float | None, typer.Option("--min-health", help="Only machines whose latest health is still above this %")
+]
+
+
+class Resolution(str, Enum):
+    """Granularity of health history queries"""
+
+    RAW = "raw"
+    MINUTE = "minute"
+    HOUR = "hour"
+
+
+RESOLUTION_SECONDS = {Resolution.RAW: 0, Resolution.MINUTE: MINUTE, Resolution.HOUR: HOUR}
+
+
+def epoch(value: datetime | None) -> int | None:
+    """Epoch seconds for a CLI datetime, reading naive values as UTC like the logs"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return int(value.timestamp())
+
+
+def echo_rows(rows: list[dict[str, Any]]) -> None:
+    """Print query results as JSON lines with ISO timestamps"""
+    for row in rows:
+        row["ts"] = datetime.fromtimestamp(row["ts"], UTC).isoformat()
+        typer.echo(json.dumps(row))
+
+
+@app.command("ingest")
+def ingest_command(
+    log_files: Annotated[list[Path], typer.Argument(help="Log files written with --log-file", exists=True)],
+    db: DbOption = DEFAULT_HISTORY_DB,
+    workers: Annotated[int | None, typer.Option("--workers", help="Parser processes (default: one per core)")] = None,
+    keep_raw_days: Annotated[
+        int | None, typer.Option("--keep-raw-days", help="Days of raw readings to keep")
+    ] = DEFAULT_KEEP_RAW_DAYS,
+    keep_minute_days: Annotated[
+        int | None, typer.Option("--keep-minute-days", help="Days of minute rollups to keep")
+    ] = DEFAULT_KEEP_MINUTE_DAYS,
+    keep_hour_days: Annotated[
+        int | None, typer.Option("--keep-hour-days", help="Days of hour rollups to keep (default: forever)")
+    ] = DEFAULT_KEEP_HOUR_DAYS,
+    keep_transition_days: Annotated[
+        int | None, typer.Option("--keep-transition-days", help="Days of transitions to keep (default: forever)")
+    ] = DEFAULT_KEEP_TRANSITION_DAYS,
+) -> None:
+    """Ingest new lines from log files, resuming where the last ingest stopped"""
+    logger = setup_logging()
+    conn = open_store(db)
+
+    readings, transition_count = ingest(conn, log_files, max_workers=workers)
+    prune(conn, Retention(keep_raw_days, keep_minute_days, keep_hour_days, keep_transition_days), now=int(time.time()))
+    conn.close()
+
+    logger.info("history_ingested", files=len(log_files), readings=readings, transitions=transition_count)
+
+
+@app.command("health")
+def health_command(
+    db: DbOption = DEFAULT_HISTORY_DB,
+    resolution: Annotated[Resolution, typer.Option("--resolution", help="raw, minute or hour")] = Resolution.HOUR,
+    machine: MachineOption = None,
+    since: SinceOption = None,
+    until: UntilOption = None,
+    min_health: MinHealthOption = None,
+) -> None:
+    """Battery health over time"""
+    conn = open_store(db)
+    echo_rows(
+        health_history(
+            conn,
+            RESOLUTION_SECONDS[resolution],
+            machine=machine,
+            since=epoch(since),
+            until=epoch(until),
+            min_health=min_health,
+        )
+    )
+    conn.close()
+
+
+@app.command("machines")
+def machines_command(db: DbOption = DEFAULT_HISTORY_DB, min_health: MinHealthOption = None) -> None:
+    """Latest reading per machine"""
+    conn = open_store(db)
+    echo_rows(machines(conn, min_health=min_health))
+    conn.close()
+
+
+@app.command("transitions")
+def transitions_command(
+    db: DbOption = DEFAULT_HISTORY_DB,
+    machine: MachineOption = None,
+    since: SinceOption = None,
+    until: UntilOption = None,
+) -> None:
+    """Charging transitions in time order"""
+    conn = open_store(db)
+    echo_rows(transitions(conn, machine=machine, since=epoch(since), until=epoch(until)))
+    conn.close()
+
+
+if __name__ == "__main__":
+    app()
@@ -9,6 +9,8 @@ class BatteryInfo(Protocol):
     cycle_count: int
     is_charging: bool
     is_plugged_in: bool
+    amperage: int
+    has_amperage: bool
 
 class _Lib(Protocol):
     def FetchBatteryInfo(self) -> BatteryInfo: ...
@@ -0,0 +1,158 @@
+"""
+Energy ledger
+
+The loops only count a "cycle" when they switch between max_charge and
+min_charge. Cell wear follows charge throughput, partial swings included, so
+the ledger counts every mAh moved between successive readings:
+
+  - with amperage on both readings, integrates the average current over the
+    wall-clock time between them (coulomb counting). 0 mA is a real reading,
+    e.g. on AC with charging disabled; only has_amperage says it's missing
+  - otherwise, or when the gap is much longer than the polling interval
+    (the machine slept, or the clock jumped), uses the change in
+    current_capacity, since the current in between is unknown
+
+One equivalent full cycle (EFC) is a full battery's worth of discharge, so a
+reading that drains 10% of max_capacity adds 0.1 EFC. Wear per EFC is the
+health lost since the ledger started, divided by the EFCs so far. It is the
+number to compare across machines and threshold settings
+
+Each reading costs O(1), and totals are saved to a JSON file after every
+reading. The previous reading is not saved, so whatever happened while the
+tool wasn't running is never counted
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import structlog
+
+if TYPE_CHECKING:
+    from batterytool.iokit_wrapper import BatteryInfo
+
+SECONDS_PER_HOUR = 3600
+
+# Longest gap, in polling intervals, that coulomb counting is trusted over
+MAX_GAP_INTERVALS = 3
+
+
+@dataclass
+class _Previous:
+    """The last reading, kept in memory only"""
+
+    capacity: int
+    amperage: int | None
+    time: float
+
+
+@dataclass
+class EnergyLedger:
+    """Running charge throughput totals, persisted to path"""
+
+    path: Path
+    mah_charged: float = 0.0
+    mah_discharged: float = 0.0
+    equivalent_full_cycles: float = 0.0
+    start_health: float | None = None
+    start_cycle_count: int | None = None
+    health: float | None = None
+    cycle_count: int | None = None
+    interval: float | None = field(default=None, repr=False)
+    _previous: _Previous | None = field(default=None, repr=False)
+
+    @classmethod
+    def load(cls, path: Path, interval: float | None = None) -> "EnergyLedger":
+        """Resume the totals saved at path, or start a new ledger there, for a loop polling every interval seconds
+
+        A file that can't be read back (empty, corrupt, or from an older
+        version) is logged and replaced by a new ledger, since the ledger must
+        never stop the loop from starting
+        """
+        if not path.exists():
+            return cls(path, interval=interval)
+        try:
+            saved = json.loads(path.read_text())
+            return cls(
+                path,
+                mah_charged=saved["mah_charged"],
+                mah_discharged=saved["mah_discharged"],
+                equivalent_full_cycles=saved["equivalent_full_cycles"],
+                start_health=saved["start_health"],
+                start_cycle_count=saved["start_cycle_count"],
+                health=saved["health"],
+                cycle_count=saved["cycle_count"],
+                interval=interval,
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            structlog.get_logger().error(
+                "ledger_failed",
+                error=str(e),
+                message=f"Can't read the energy ledger at {path}, starting a new one",
+            )
+            return cls(path, interval=interval)
+
+    def record(self, battery_info: "BatteryInfo", battery_health: float, now: float | None = None) -> dict[str, Any]:
+        """Add one reading to the totals, save them, and return the summary"""
+        # Wall clock, not monotonic: on macOS the monotonic clock stops during sleep
+        now = time.time() if now is None else now
+        amperage = battery_info.amperage if battery_info.has_amperage else None
+        previous = self._previous
+
+        if previous is not None:
+            elapsed = now - previous.time
+            if previous.amperage is not None and amperage is not None and self._steady(elapsed):
+                average_ma = (previous.amperage + amperage) / 2
+                delta = average_ma * elapsed / SECONDS_PER_HOUR
+            else:
+                delta = battery_info.current_capacity - previous.capacity
+
+            if delta > 0:
+                self.mah_charged += delta
+            else:
+                self.mah_discharged -= delta
+                if battery_info.max_capacity > 0:
+                    self.equivalent_full_cycles -= delta / battery_info.max_capacity
+
+        if self.start_health is None:
+            self.start_health = battery_health
+            self.start_cycle_count = battery_info.cycle_count
+        self.health = battery_health
+        self.cycle_count = battery_info.cycle_count
+        self._previous = _Previous(battery_info.current_capacity, amperage, now)
+
+        self.save()
+        return self.summary()
+
+    def _steady(self, elapsed: float) -> bool:
+        """Whether two readings elapsed apart were polled back to back, with no sleep or clock jump between"""
+        if elapsed < 0:
+            return False
+        return self.interval is None or elapsed <= MAX_GAP_INTERVALS * max(self.interval, 1)
+
+    def summary(self) -> dict[str, Any]:
+        """Totals as log fields"""
+        wear = None
+        if self.start_health is not None and self.health is not None and self.equivalent_full_cycles > 0:
+            wear = (self.start_health - self.health) / self.equivalent_full_cycles
+        cycles = None
+        if self.start_cycle_count is not None and self.cycle_count is not None:
+            cycles = self.cycle_count - self.start_cycle_count
+        return {
+            "mah_charged": self.mah_charged,
+            "mah_discharged": self.mah_discharged,
+            "equivalent_full_cycles": self.equivalent_full_cycles,
+            "cycle_count_delta": cycles,
+            "wear_per_equivalent_cycle": wear,
+        }
+
+    def save(self) -> None:
+        """Write the totals atomically, so a crash mid-write keeps the old file"""
+        saved = asdict(self)
+        del saved["path"], saved["interval"], saved["_previous"]
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(saved))
+        os.replace(tmp, self.path)
@@ -26,6 +26,13 @@ def setup_logging(log_file: Path | None = None) -> structlog.stdlib.BoundLogger:
     root = logging.getLogger()
     root.setLevel(logging.INFO)
 
+    # Drop handlers from an earlier call, otherwise every event is rendered
+    # and written once per call for the rest of the process
+    for handler in root.handlers[:]:
+        if isinstance(handler.formatter, structlog.stdlib.ProcessorFormatter):
+            root.removeHandler(handler)
+            handler.close()
+
     console = logging.StreamHandler()
     console.setFormatter(formatter)
     root.addHandler(console)
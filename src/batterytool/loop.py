@@ -1,4 +1,5 @@
 import time
+from typing import TYPE_CHECKING, Any
 
 import structlog
 
@@ -9,6 +10,30 @@ from batterytool.battery import (
     tahoe_disable_charging,
     tahoe_enable_charging,
 )
+from batterytool.ledger import EnergyLedger
+
+if TYPE_CHECKING:
+    from batterytool.iokit_wrapper import BatteryInfo
+
+
+def _record_ledger(
+    ledger: EnergyLedger | None,
+    battery_info: "BatteryInfo",
+    battery_health: float,
+    logger: structlog.stdlib.BoundLogger,
+) -> dict[str, Any]:
+    """Add a reading to the ledger, if any, and return its log fields
+
+    The ledger is optional accounting, so a failure (e.g. a read-only or full
+    disk) is logged and the loop keeps cycling
+    """
+    if ledger is None:
+        return {}
+    try:
+        return ledger.record(battery_info, battery_health)
+    except Exception as e:
+        logger.error("ledger_failed", error=str(e), message="Energy ledger not updated")
+        return {}
 
 
 def legacy_loop(
@@ -17,6 +42,7 @@ def legacy_loop(
     min_charge: int,
     interval: int,
     logger: structlog.stdlib.BoundLogger,
+    ledger: EnergyLedger | None = None,
 ) -> None:
     """Battery cycling loop using legacy SMC keys (pre-macOS 15.7)"""
     charging_enabled = True
@@ -26,12 +52,14 @@ def legacy_loop(
             battery_info = fetch_battery_info()
 
             if battery_info.max_capacity <= 0 or battery_info.design_capacity <= 0:
-                logger.error("invalid_battery_data", message="Failed to read valid battery capacity from IOKit")
+                logger.error("invalid_battery_data", message="Failed to read valid battery capacity")
                 break
 
             battery_percentage = battery_info.current_capacity / battery_info.max_capacity * 100
             battery_health = battery_info.max_capacity / battery_info.design_capacity * 100
 
+            ledger_fields = _record_ledger(ledger, battery_info, battery_health, logger)
+
             logger.info(
                 "battery_reading",
                 battery_percentage=battery_percentage,
@@ -43,6 +71,7 @@ def legacy_loop(
                 is_charging=battery_info.is_charging,
                 is_plugged_in=battery_info.is_plugged_in,
                 charging_enabled=charging_enabled,
+                **ledger_fields,
             )
 
             if battery_health <= target_health:
@@ -79,6 +108,7 @@ def tahoe_loop(
     min_charge: int,
     interval: int,
     logger: structlog.stdlib.BoundLogger,
+    ledger: EnergyLedger | None = None,
 ) -> None:
     """Battery cycling loop using Tahoe SMC keys (macOS 15.7+)"""
     charging_enabled = True
@@ -88,12 +118,14 @@ def tahoe_loop(
             battery_info = fetch_battery_info()
 
             if battery_info.max_capacity <= 0 or battery_info.design_capacity <= 0:
-                logger.error("invalid_battery_data", message="Failed to read valid battery capacity from IOKit")
+                logger.error("invalid_battery_data", message="Failed to read valid battery capacity")
                 break
 
             battery_percentage = battery_info.current_capacity / battery_info.max_capacity * 100
             battery_health = battery_info.max_capacity / battery_info.design_capacity * 100
 
+            ledger_fields = _record_ledger(ledger, battery_info, battery_health, logger)
+
             logger.info(
                 "battery_reading",
                 battery_percentage=battery_percentage,
@@ -105,6 +137,7 @@ def tahoe_loop(
                 is_charging=battery_info.is_charging,
                 is_plugged_in=battery_info.is_plugged_in,
                 charging_enabled=charging_enabled,
+                **ledger_fields,
             )
 
             if battery_health <= target_health:
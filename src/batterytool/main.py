@@ -3,7 +3,8 @@ from typing import TYPE_CHECKING, Annotated
 
 import typer
 
-from batterytool.battery import fetch_battery_info, is_apple_silicon, is_tahoe
+from batterytool.battery import fetch_battery_info, is_apple_silicon, is_linux, is_tahoe
+from batterytool.ledger import EnergyLedger
 from batterytool.logging import setup_logging
 from batterytool.loop import legacy_loop, tahoe_loop
 
@@ -22,23 +23,28 @@ def main(
     interval: Annotated[int, typer.Option("--interval", help="Polling interval in seconds")] = 60,
     log_file: Annotated[Path | None, typer.Option("--log-file", help="Save logs to file")] = None,
     status: Annotated[bool, typer.Option("--status", help="Show battery status and exit")] = False,
+    ledger_file: Annotated[
+        Path | None, typer.Option("--ledger-file", help="Keep charge throughput totals in this file")
+    ] = None,
 ) -> None:
     """BatteryTool - Cycle your MacBook battery for warranty replacement"""
     logger = setup_logging(log_file)
 
-    if not is_apple_silicon():
-        logger.error("unsupported", message="Only Apple Silicon Macs are supported")
+    if not is_apple_silicon() and not is_linux():
+        logger.error("unsupported", message="Only Apple Silicon Macs and Linux laptops are supported")
         return
 
     battery_info: BatteryInfo = fetch_battery_info()
 
     if battery_info.max_capacity <= 0 or battery_info.design_capacity <= 0:
-        logger.error("invalid_battery_data", message="Failed to read valid battery capacity from IOKit")
+        logger.error("invalid_battery_data", message="Failed to read valid battery capacity")
         return
 
     battery_percentage = battery_info.current_capacity / battery_info.max_capacity * 100
     battery_health = battery_info.max_capacity / battery_info.design_capacity * 100
 
+    ledger = EnergyLedger.load(ledger_file, interval) if ledger_file is not None else None
+
     if status:
         logger.info(
             "battery_status",
@@ -50,6 +56,7 @@ def main(
             cycle_count=battery_info.cycle_count,
             is_charging=battery_info.is_charging,
             charger_connected=battery_info.is_plugged_in,
+            **(ledger.summary() if ledger is not None else {}),
         )
         return
 
@@ -59,9 +66,9 @@ def main(
         return
 
     if is_tahoe():
-        tahoe_loop(target_health, max_charge, min_charge, interval, logger)
+        tahoe_loop(target_health, max_charge, min_charge, interval, logger, ledger)
     else:
-        legacy_loop(target_health, max_charge, min_charge, interval, logger)
+        legacy_loop(target_health, max_charge, min_charge, interval, logger, ledger)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+"""
+Linux sysfs backend
+
+Linux laptops expose their battery under /sys/class/power_supply/BAT*. This
+module implements the same ffi/lib surface as the iokit_wrapper CFFI module
+on top of those files, so battery.py can bind it and the loops in loop.py run
+unchanged
+
+  FetchBatteryInfo   charge_now, charge_full, charge_full_design (uAh, reported
+                     in mAh like IOKit), or energy_now, energy_full,
+                     energy_full_design (uWh, converted to mAh at
+                     voltage_min_design) on drivers that report energy;
+                     status; cycle_count and current_now (uA, signed like
+                     IOKit's Amperage) or power_now where the driver has
+                     them; and the online flag of the first Mains supply
+  SmcWriteKey        translates the legacy SMC keys:
+                       CH0B/CH0C -> charge_control_end_threshold
+                                    ("00" allows charging up to 100%, "02"
+                                    lowers the threshold so charging stops)
+                       CH0I      -> charge_behaviour ("01" force-discharge,
+                                    "00" auto), where the driver supports it
+  SmcReadKey         succeeds only for keys whose sysfs file exists, so
+                     is_tahoe() is False and main() picks the legacy loop
+
+The battery is discovered once, on first use. A battery missing a required
+file is logged by name and treated as no battery, so the loop stops on
+invalid data instead of crashing mid-poll. Files read on every poll are
+opened once and read with pread, so polling costs one syscall per attribute
+and no path lookups. Writes only happen on charge toggles, so they open the
+file each time
+"""
+
+import os
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from batterytool.constants import SMCKeys, SMCValues
+
+POWER_SUPPLY_ROOT = Path("/sys/class/power_supply")
+
+# Lowest end threshold; the battery is already above it whenever the loop
+# disables charging, so the controller stops charging. Some drivers reject it
+# (dell-laptop's minimum is 55, lg-laptop only takes 80 or 100), which write()
+# logs as charge_control_rejected
+DISABLE_CHARGING_THRESHOLD = b"1"
+ENABLE_CHARGING_THRESHOLD = b"100"
+
+CHARGE_THRESHOLD_FILE = "charge_control_end_threshold"
+CHARGE_BEHAVIOUR_FILE = "charge_behaviour"
+
+KEY_FILES: dict[bytes, str] = {
+    SMCKeys.CHARGING_CONTROL_B: CHARGE_THRESHOLD_FILE,
+    SMCKeys.CHARGING_CONTROL_C: CHARGE_THRESHOLD_FILE,
+    SMCKeys.DISCHARGE_CONTROL_I: CHARGE_BEHAVIOUR_FILE,
+}
+
+VALUE_WRITES: dict[tuple[str, bytes], bytes] = {
+    (CHARGE_THRESHOLD_FILE, SMCValues.ENABLE_CHARGING): ENABLE_CHARGING_THRESHOLD,
+    (CHARGE_THRESHOLD_FILE, SMCValues.DISABLE_CHARGING): DISABLE_CHARGING_THRESHOLD,
+    (CHARGE_BEHAVIOUR_FILE, SMCValues.ENABLE_DISCHARGE): b"force-discharge",
+    (CHARGE_BEHAVIOUR_FILE, SMCValues.DISABLE_DISCHARGE): b"auto",
+}
+
+# Capacity attributes, in uAh on most drivers and in uWh on the rest
+CHARGE_FILES = ("charge_now", "charge_full", "charge_full_design")
+ENERGY_FILES = ("energy_now", "energy_full", "energy_full_design")
+# Converts uWh to mAh; the design minimum is constant, so health and
+# percentage come out the same as the uWh ratios
+VOLTAGE_FILE = "voltage_min_design"
+STATUS_FILE = "status"
+# Needed by every unit family; charge_behaviour is optional (no forced discharge)
+REQUIRED_FILES = (STATUS_FILE, CHARGE_THRESHOLD_FILE)
+
+# Longest attribute value read per poll
+READ_SIZE = 64
+
+
+@dataclass
+class BatteryInfo:
+    """Same fields as the CFFI BatteryInfo struct"""
+
+    current_capacity: int = 0
+    max_capacity: int = 0
+    design_capacity: int = 0
+    cycle_count: int = 0
+    is_charging: bool = False
+    is_plugged_in: bool = False
+    amperage: int = 0
+    has_amperage: bool = False
+
+
+class SysfsBattery:
+    """One discovered battery, with its polled attributes held open"""
+
+    def __init__(self, path: Path, mains: Path | None):
+        self.path = path
+        # None when capacities are in uAh; the design voltage in uV when in uWh
+        self._voltage = None if _has_all(path, CHARGE_FILES) else int(_read_text(path / VOLTAGE_FILE) or 0)
+        now, full, design = CHARGE_FILES if self._voltage is None else ENERGY_FILES
+        self._now = os.open(path / now, os.O_RDONLY)
+        self._full = os.open(path / full, os.O_RDONLY)
+        self._full_design = os.open(path / design, os.O_RDONLY)
+        self._status = os.open(path / STATUS_FILE, os.O_RDONLY)
+        self._cycle_count = self._open_optional(path / "cycle_count")
+        self._current_now = self._open_optional(path / "current_now")
+        # Energy drivers often report power (uW) instead of current
+        self._power_now = (
+            self._open_optional(path / "power_now") if self._current_now is None and self._voltage else None
+        )
+        self._online = self._open_optional(mains / "online") if mains is not None else None
+
+    def info(self) -> BatteryInfo:
+        """Read one snapshot of the battery"""
+        status = self._read(self._status)
+        plugged_in = self._read(self._online) == b"1" if self._online is not None else status != b"Discharging"
+        # Most drivers report current_now unsigned; the sign comes from status
+        amperage = 0
+        if self._current_now is not None:
+            amperage = abs(int(self._read(self._current_now))) // 1000
+        elif self._power_now is not None:
+            amperage = abs(self._mah(self._power_now))
+        return BatteryInfo(
+            current_capacity=self._mah(self._now),
+            max_capacity=self._mah(self._full),
+            design_capacity=self._mah(self._full_design),
+            cycle_count=int(self._read(self._cycle_count)) if self._cycle_count is not None else 0,
+            is_charging=status == b"Charging",
+            is_plugged_in=plugged_in,
+            amperage=-amperage if status == b"Discharging" else amperage,
+            has_amperage=self._current_now is not None or self._power_now is not None,
+        )
+
+    def write(self, name: str, value: bytes) -> int:
+        """Write a control attribute; 0 on success, -1 if missing or rejected
+
+        A rejected write is logged with the attribute and value: drivers
+        differ in the thresholds they accept, and the loops don't check
+        """
+        try:
+            fd = os.open(self.path / name, os.O_WRONLY | os.O_TRUNC)
+        except FileNotFoundError:
+            # Optional attributes (charge_behaviour) fail like an unknown SMC key
+            return -1
+        except OSError as e:
+            self._log_rejected(name, value, e)
+            return -1
+        try:
+            os.write(fd, value + b"\n")
+        except OSError as e:
+            self._log_rejected(name, value, e)
+            return -1
+        finally:
+            os.close(fd)
+        return 0
+
+    def _log_rejected(self, name: str, value: bytes, error: OSError) -> None:
+        structlog.get_logger().error(
+            "charge_control_rejected",
+            path=str(self.path / name),
+            value=value.decode(),
+            error=str(error),
+            message="The driver rejected a charge control write; charging may not have changed",
+        )
+
+    def has(self, name: str) -> bool:
+        """Whether the driver exposes this attribute"""
+        return (self.path / name).exists()
+
+    def close(self) -> None:
+        """Close the held file descriptors"""
+        for fd in (self._now, self._full, self._full_design, self._status):
+            os.close(fd)
+        for fd in (self._cycle_count, self._current_now, self._power_now, self._online):
+            if fd is not None:
+                os.close(fd)
+
+    def _mah(self, fd: int) -> int:
+        """Convert uAh (or uA) to mAh, or uWh (or uW) at the design voltage"""
+        raw = int(self._read(fd))
+        return raw // 1000 if self._voltage is None else raw * 1000 // self._voltage
+
+    @staticmethod
+    def _open_optional(path: Path) -> int | None:
+        return os.open(path, os.O_RDONLY) if path.exists() else None
+
+    @staticmethod
+    def _read(fd: int) -> bytes:
+        return os.pread(fd, READ_SIZE, 0).strip()
+
+
+def discover(root: Path) -> SysfsBattery | None:
+    """Find the first usable BAT* battery and the first Mains supply
+
+    Logs an error naming the missing files when a battery lacks a required
+    attribute, and when there is no battery at all
+    """
+    logger = structlog.get_logger()
+    if not root.is_dir():
+        logger.error("battery_not_found", message=f"{root} does not exist")
+        return None
+
+    battery = None
+    mains = None
+    unusable: dict[str, list[str]] = {}
+    for supply in sorted(root.iterdir()):
+        kind = _read_text(supply / "type")
+        if battery is None and kind == "Battery" and supply.name.startswith("BAT"):
+            missing = missing_files(supply)
+            if missing:
+                unusable[str(supply)] = missing
+            else:
+                battery = supply
+        elif mains is None and kind == "Mains":
+            mains = supply
+
+    if battery is None:
+        for path, missing in unusable.items():
+            logger.error(
+                "battery_unsupported", path=path, missing=missing, message="Battery lacks required sysfs files"
+            )
+        if not unusable:
+            logger.error("battery_not_found", message=f"No BAT* battery in {root}")
+        return None
+    return SysfsBattery(battery, mains)
+
+
+def missing_files(supply: Path) -> list[str]:
+    """Required attributes the supply lacks, in the unit family it comes closest to; empty if usable"""
+    charge = [name for name in (*CHARGE_FILES, *REQUIRED_FILES) if not (supply / name).exists()]
+    if not charge:
+        return []
+    energy = [name for name in (*ENERGY_FILES, *REQUIRED_FILES) if not (supply / name).exists()]
+    voltage = _read_text(supply / VOLTAGE_FILE)
+    if voltage is None or not voltage.isdigit() or int(voltage) == 0:
+        # Without a design voltage uWh can't be converted to mAh
+        energy.append(VOLTAGE_FILE)
+    return energy if len(energy) < len(charge) else charge
+
+
+def _has_all(path: Path, names: tuple[str, ...]) -> bool:
+    return all((path / name).exists() for name in names)
+
+
+def _read_text(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+class SysfsLib:
+    """Drop-in for the CFFI lib object, backed by sysfs"""
+
+    def __init__(self, root: Path = POWER_SUPPLY_ROOT):
+        self.root = root
+
+    @cached_property
+    def battery(self) -> SysfsBattery | None:
+        """The battery, discovered on first use"""
+        return discover(self.root)
+
+    def FetchBatteryInfo(self) -> BatteryInfo:
+        """Current battery info; all zeros (invalid data) without a battery"""
+        if self.battery is None:
+            return BatteryInfo()
+        return self.battery.info()
+
+    def SmcWriteKey(self, key: bytes, value: bytes) -> int:
+        """Apply an SMC key write to its sysfs attribute; -1 for keys with no equivalent"""
+        name = KEY_FILES.get(key)
+        if self.battery is None or name is None:
+            return -1
+        sysfs_value = VALUE_WRITES.get((name, value))
+        if sysfs_value is None:
+            return -1
+        return self.battery.write(name, sysfs_value)
+
+    def SmcReadKey(self, key: bytes, value: bytearray, value_size: int) -> int:
+        """Succeeds only for keys whose sysfs attribute exists"""
+        name = KEY_FILES.get(key)
+        if self.battery is None or name is None or not self.battery.has(name):
+            return -1
+        return 0
+
+
+class SysfsFFI:
+    """Drop-in for the CFFI ffi object; only allocates char buffers"""
+
+    def new(self, cdecl: str) -> Any:
+        """Allocate a zeroed buffer for a "char[N]" declaration"""
+        return bytearray(int(cdecl.removeprefix("char[").removesuffix("]")))
+
+
+ffi = SysfsFFI()
+lib = SysfsLib()
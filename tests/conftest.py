@@ -1,11 +1,16 @@
+import importlib.util
 import logging
 import os
 import platform
+import sys
 from types import MappingProxyType
 
-# Must be set before any batterytool import so battery.py binds the
-# file-backed fake backend instead of the real IOKit extension
-os.environ["BATTERYTOOL_FAKE"] = "1"
+# The fake extension is only built on macOS; Linux binds the sysfs backend.
+# Where it exists, this must be set before any other batterytool import so
+# battery.py binds the file-backed fake instead of the real IOKit extension
+HAS_FAKE_BACKEND = importlib.util.find_spec("batterytool.iokit_wrapper_fake") is not None
+if HAS_FAKE_BACKEND:
+    os.environ["BATTERYTOOL_FAKE"] = "1"
 
 import pytest  # noqa: E402
 import structlog  # noqa: E402
@@ -30,11 +35,15 @@ class FakeHardware:
     def script(self, *rows):
         """Script battery readings; each row is
         (current_mAh, max_mAh, design_mAh, cycle_count, is_charging, is_plugged_in)
-        The loop consumes one row per poll; the last row repeats"""
+        with an optional trailing amperage_mA (without it, has_amperage is false). The loop consumes one row per poll; the last row repeats"""
         (self.dir / "battery_script").write_text(
             "".join(" ".join(str(field) for field in row) + "\n" for row in rows)
         )
 
+    def rewind(self):
+        """Replay the script from its first row on the next poll"""
+        (self.dir / "battery_cursor").unlink(missing_ok=True)
+
     def writes(self):
         """The listener log: every successful SMC write as 'KEY=hexvalue'"""
         log = self.dir / "smc_writes.log"
@@ -48,14 +57,85 @@ def hw(tmp_path, monkeypatch):
     return FakeHardware(tmp_path)
 
 
+class FakeSysfs:
+    """A /sys/class/power_supply tree in a tmp dir for the sysfs backend"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def battery(self, name="BAT0", controls=("charge_control_end_threshold", "charge_behaviour"), **attrs):
+        """Create a battery; attrs in sysfs units (uAh), e.g. charge_now=50000"""
+        defaults = {
+            "charge_now": 50000,
+            "charge_full": 100000,
+            "charge_full_design": 100000,
+            "cycle_count": 10,
+            "status": "Charging",
+        }
+        for control in controls:
+            defaults[control] = {"charge_control_end_threshold": 100, "charge_behaviour": "auto"}[control]
+        self.supply(name, type="Battery", **defaults | attrs)
+
+    def supply(self, name, **attrs):
+        """Create or update a power supply; rewrites in place like the kernel does"""
+        supply = self.root / name
+        supply.mkdir(exist_ok=True)
+        for attr, value in attrs.items():
+            (supply / attr).write_text(f"{value}\n")
+
+    def read(self, name, attr):
+        return (self.root / name / attr).read_text().strip()
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """Fresh fake power_supply tree for the sysfs backend"""
+    root = tmp_path / "power_supply"
+    root.mkdir()
+    return FakeSysfs(root)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("batterytool")
+    group.addoption("--scenarios", type=int, default=1000, help="number of randomized loop scenarios to run")
+    group.addoption("--scenario-seed", type=int, default=0, help="seed for the randomized loop scenarios")
+    group.addoption("--soak-iterations", type=int, default=5000, help="polls per soak run, after warmup")
+
+
 def pytest_collection_modifyitems(items):
     """Central home for conditional marks, applied by name at collection time"""
     needs_apple_silicon = pytest.mark.skipif(
-        platform.machine() != "arm64", reason="main() rejects non-Apple-Silicon machines"
+        platform.machine() != "arm64" and sys.platform != "linux",
+        reason="main() rejects machines that are neither Apple Silicon Macs nor Linux",
+    )
+    needs_fake_backend = pytest.mark.skipif(
+        not HAS_FAKE_BACKEND, reason="the fake backend (hw fixture) is only built on macOS"
     )
     for item in items:
         if "apple_silicon" in item.keywords:
             item.add_marker(needs_apple_silicon)
+        if "hw" in item.fixturenames:
+            item.add_marker(needs_fake_backend)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print the soak reports recorded with record_property("soak", ...)
+
+    Runs on the controller, from the user_properties xdist sends back with
+    each report: output printed inside a worker never reaches the terminal
+    """
+    lines = [
+        f"{report.nodeid}: {value}"
+        for outcome in ("passed", "failed")
+        for report in terminalreporter.stats.get(outcome, [])
+        if getattr(report, "when", None) == "call"
+        for name, value in getattr(report, "user_properties", ())
+        if name == "soak"
+    ]
+    if lines:
+        terminalreporter.section("soak report")
+        for line in lines:
+            terminalreporter.write_line(line)
 
 
 @pytest.fixture(autouse=True)
@@ -0,0 +1,143 @@
+"""Randomized battery scenarios for the fake backend
+
+Every scenario is a seeded, self-contained description of one loop run: the
+SMC key layout, the thresholds and the scripted readings. Generation is pure
+and deterministic, so every pytest-xdist worker collects the exact same set
+and a failing id can be replayed with the same --scenario-seed
+"""
+
+import math
+import random
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+
+from tests.conftest import LEGACY_KEYS, TAHOE_FALLBACK_KEYS, TAHOE_KEYS
+
+from batterytool.loop import legacy_loop, tahoe_loop
+
+# (current_mAh, max_mAh, design_mAh, cycle_count, is_charging, is_plugged_in)
+Row = tuple[int, int, int, int, int, int]
+
+
+@dataclass(frozen=True)
+class Layout:
+    """One SMC key layout and the writes it produces per toggle"""
+
+    name: str
+    keys: Mapping[str, str]
+    loop: Callable[..., None]
+    enable: tuple[str, ...]
+    disable: tuple[str, ...]
+
+
+LAYOUTS = (
+    Layout(
+        "legacy",
+        LEGACY_KEYS,
+        legacy_loop,
+        enable=("CH0B=00", "CH0C=00", "CH0I=00"),
+        disable=("CH0B=02", "CH0C=02", "CH0I=01"),
+    ),
+    Layout(
+        "tahoe",
+        TAHOE_KEYS,
+        tahoe_loop,
+        enable=("CHTE=00000000", "CHIE=00"),
+        disable=("CHTE=01000000", "CHIE=08"),
+    ),
+    Layout(
+        "tahoe_ch0j",
+        TAHOE_FALLBACK_KEYS,
+        tahoe_loop,
+        enable=("CHTE=00000000", "CH0J=00"),
+        disable=("CHTE=01000000", "CH0J=01"),
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Interrupt:
+    """Raise exception from the loop's poll-th call to hook ("fetch" or "sleep")"""
+
+    hook: str
+    poll: int
+    exception: type[BaseException]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """One randomized loop run against the fake backend"""
+
+    id: str
+    layout: Layout
+    target_health: int
+    max_charge: int
+    min_charge: int
+    rows: tuple[Row, ...]
+    # Ends the run early, through the loop's KeyboardInterrupt or unexpected_error exit
+    interrupt: Interrupt | None = None
+
+
+def generate_scenarios(seed: int, count: int) -> list[Scenario]:
+    """Build count scenarios from seed; the same inputs always give the same list"""
+    rng = random.Random(seed)
+    return [_scenario(rng, index) for index in range(count)]
+
+
+def _scenario(rng: random.Random, index: int) -> Scenario:
+    layout = rng.choice(LAYOUTS)
+    min_charge = rng.randint(1, 40)
+    max_charge = rng.randint(min_charge + 10, 99)
+    target_health = rng.randint(60, 90)
+
+    design = rng.randint(3000, 8000)
+    # Smallest max_mAh whose health is still strictly above target
+    healthy_floor = math.floor(design * target_health / 100) + 1
+    max_cap = rng.randint(healthy_floor, design)
+    cycle_count = rng.randint(0, 1000)
+    percent = rng.uniform(0, 100)
+
+    rows: list[Row] = []
+    for _ in range(rng.randint(0, 60)):
+        if rng.random() < 0.1:
+            # Jump to either end so both thresholds get crossed regularly
+            percent = rng.choice((rng.uniform(0, min_charge), rng.uniform(max_charge, 100)))
+        else:
+            percent = min(100.0, max(0.0, percent + rng.uniform(-15, 15)))
+        max_cap = max(healthy_floor, max_cap - rng.randint(0, 3))
+        cycle_count += rng.randint(0, 1)
+        rows.append((round(max_cap * percent / 100), max_cap, design, cycle_count, *_flags(rng)))
+
+    # The last row repeats forever, so every script must end on a row that stops the loop
+    if rng.random() < 0.9:
+        final_cap = rng.randint(1, healthy_floor - 1)
+        rows.append((rng.randint(0, final_cap), final_cap, design, cycle_count, *_flags(rng)))
+    else:
+        rows.append(rng.choice(((0, 0, 0, 0, 0, 0), (50, 100, 0, cycle_count, 1, 1))))
+
+    # Some runs are cut short before that row: Ctrl-C or a backend error, from
+    # either the battery read or the sleep. The final row never sleeps
+    interrupt = None
+    if rng.random() < 0.2:
+        exception = rng.choice((KeyboardInterrupt, OSError))
+        last = len(rows) - 1
+        if last > 0 and rng.random() < 0.5:
+            interrupt = Interrupt("sleep", rng.randint(0, last - 1), exception)
+        else:
+            interrupt = Interrupt("fetch", rng.randint(0, last), exception)
+
+    suffix = f"-{interrupt.hook}-{interrupt.exception.__name__}" if interrupt is not None else ""
+    return Scenario(
+        id=f"{index}-{layout.name}{suffix}",
+        layout=layout,
+        target_health=target_health,
+        max_charge=max_charge,
+        min_charge=min_charge,
+        rows=tuple(rows),
+        interrupt=interrupt,
+    )
+
+
+def _flags(rng: random.Random) -> tuple[int, int]:
+    """Random (is_charging, is_plugged_in) pair"""
+    return rng.randint(0, 1), rng.randint(0, 1)
@@ -0,0 +1,161 @@
+"""Soak harness: drive a loop for many polls and measure its memory
+
+The loop sleeps once per poll, so a virtual clock standing in for time.sleep
+is both the stopwatch and the off switch. It advances virtual time instead of
+waiting, samples tracemalloc on every poll, and raises KeyboardInterrupt after
+the last poll so the loop leaves through its normal cleanup path
+
+CPython keeps no running count of allocations, and tracemalloc only sees what
+is alive at once, so objects allocated and freed within a poll never show up in
+its numbers. To count them, a profile hook samples sys.getallocatedblocks() on
+every Python and C call and return during the measured polls, and adds up the
+increases. That is every allocation that outlives the call it was made in
+"""
+
+import resource
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SoakReport:
+    polls: int
+    virtual_seconds: int
+    retained_bytes: int
+    # Least-squares slope of traced memory over the measured polls
+    growth_bytes_per_poll: float
+    mean_allocations_per_poll: float
+    max_allocations_per_poll: int
+    mean_peak_bytes_per_poll: float
+    max_peak_bytes_per_poll: int
+    rss_growth_bytes: int
+    top_growth: tuple[str, ...]
+
+    def summary(self):
+        return (
+            f"{self.polls} polls ({self.virtual_seconds / 86400:.0f} virtual days): "
+            f"{self.mean_allocations_per_poll:.0f} allocations per poll (max {self.max_allocations_per_poll}), "
+            f"peak +{self.mean_peak_bytes_per_poll:.0f} B per poll (max {self.max_peak_bytes_per_poll}), "
+            f"traced memory {self.growth_bytes_per_poll:+.3f} B per poll ({self.retained_bytes} B retained), "
+            f"RSS +{self.rss_growth_bytes} B"
+        )
+
+
+class VirtualClock:
+    """Stand-in for time.sleep that measures each poll and stops after the last one"""
+
+    def __init__(self, polls, warmup, rewind=None, period=1):
+        self.polls = polls
+        self.warmup = warmup
+        # Called every period polls to replay the battery script, so the
+        # measured polls go through the same toggles as the warmup
+        self.rewind = rewind
+        self.period = period
+        self.now = 0
+        self.count = 0
+        self.previous = 0
+        self.peak_bytes = 0
+        self.max_peak_bytes = 0
+        self.blocks = 0
+        self.poll_allocations = 0
+        self.allocations = 0
+        self.max_allocations = 0
+        # Running sums for the slope of traced memory (y) over measured polls (x);
+        # ints relative to the baseline, so the fit is exact and keeps no samples
+        self.fit = [0, 0, 0, 0, 0]  # n, sum x, sum y, sum x*x, sum x*y
+        self.baseline = None
+        self.end = None
+
+    def sleep(self, seconds):
+        self.now += seconds
+        self.count += 1
+        if self.rewind is not None and self.count % self.period == 0:
+            self.rewind()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        if self.count == self.warmup:
+            snapshot = tracemalloc.take_snapshot()
+            # Measured after the snapshot, which itself stays alive until the end
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self.baseline = (current, max_rss(), snapshot)
+            self.blocks = sys.getallocatedblocks()
+            sys.setprofile(self.count_allocations)
+        elif self.count > self.warmup:
+            # Peak above where the previous poll left off: the most this poll held at once
+            peak_bytes = peak - self.previous
+            self.peak_bytes += peak_bytes
+            self.max_peak_bytes = max(self.max_peak_bytes, peak_bytes)
+            self.allocations += self.poll_allocations
+            self.max_allocations = max(self.max_allocations, self.poll_allocations)
+            self.poll_allocations = 0
+            x, y = self.count - self.warmup, current - self.baseline[0]
+            fit = self.fit
+            fit[0] += 1
+            fit[1] += x
+            fit[2] += y
+            fit[3] += x * x
+            fit[4] += x * y
+        self.previous = current
+
+        if self.count >= self.warmup + self.polls:
+            sys.setprofile(None)
+            self.end = (current, max_rss(), tracemalloc.take_snapshot())
+            raise KeyboardInterrupt
+
+    def count_allocations(self, frame, event, arg):
+        """Profile hook: add the blocks allocated since the last call or return"""
+        blocks = sys.getallocatedblocks()
+        if blocks > self.blocks:
+            self.poll_allocations += blocks - self.blocks
+        self.blocks = blocks
+
+    def report(self):
+        assert self.end is not None, f"loop stopped after {self.count} of {self.warmup + self.polls} polls"
+        (start, start_rss, start_snapshot), (end, end_rss, end_snapshot) = self.baseline, self.end
+        growth = end_snapshot.filter_traces(IGNORE_HARNESS).compare_to(
+            start_snapshot.filter_traces(IGNORE_HARNESS), "lineno"
+        )
+        n, sx, sy, sxx, sxy = self.fit
+        return SoakReport(
+            polls=self.polls,
+            virtual_seconds=self.now,
+            retained_bytes=end - start,
+            growth_bytes_per_poll=(n * sxy - sx * sy) / (n * sxx - sx * sx),
+            mean_allocations_per_poll=self.allocations / self.polls,
+            max_allocations_per_poll=self.max_allocations,
+            mean_peak_bytes_per_poll=self.peak_bytes / self.polls,
+            max_peak_bytes_per_poll=self.max_peak_bytes,
+            rss_growth_bytes=end_rss - start_rss,
+            top_growth=tuple(str(stat) for stat in growth[:10]),
+        )
+
+
+IGNORE_HARNESS = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+
+
+def max_rss():
+    """Peak resident set size in bytes (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_soak(loop, polls, warmup, monkeypatch, rewind=None, period=1, **loop_kwargs):
+    """Run loop under a virtual clock with tracemalloc on and return its report
+
+    With rewind, the battery script is replayed from its first row every
+    period polls for the whole run
+    """
+    clock = VirtualClock(polls, warmup, rewind, period)
+    monkeypatch.setattr("time.sleep", clock.sleep)
+
+    tracemalloc.start()
+    try:
+        loop(**loop_kwargs)
+    finally:
+        sys.setprofile(None)
+        tracemalloc.stop()
+
+    return clock.report()
@@ -0,0 +1,225 @@
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+
+from tests.conftest import LEGACY_KEYS
+
+from batterytool.history import (
+    HOUR,
+    MINUTE,
+    Retention,
+    health_history,
+    ingest,
+    machine_name,
+    machines,
+    open_store,
+    prune,
+    transitions,
+)
+from batterytool.logging import setup_logging
+from batterytool.loop import legacy_loop
+
+T0 = int(datetime(2026, 1, 1, tzinfo=UTC).timestamp())
+DAY = 86400
+
+
+def reading(ts, health, percentage=50.0, cycle_count=10):
+    return {
+        "event": "battery_reading",
+        "timestamp": datetime.fromtimestamp(ts, UTC).isoformat().replace("+00:00", "Z"),
+        "level": "info",
+        "battery_percentage": percentage,
+        "battery_health": health,
+        "cycle_count": cycle_count,
+        "charging_enabled": True,
+    }
+
+
+def append_log(path, *events):
+    with path.open("a") as f:
+        f.writelines(json.dumps(event) + "\n" for event in events)
+
+
+def test_ingests_real_loop_log(hw, tmp_path):
+    """A log written by the loop itself round-trips into readings and transitions"""
+    hw.set_keys(LEGACY_KEYS)
+    hw.script((96, 100, 100, 10, 1, 1), (79, 79, 100, 11, 1, 1))
+    log_file = tmp_path / "mbp-lab-1.log"
+    # Readings are unique per machine and second, so poll a second apart like a real run
+    legacy_loop(target_health=79, max_charge=95, min_charge=5, interval=1, logger=setup_logging(log_file=log_file))
+
+    conn = open_store(tmp_path / "history.db")
+    assert ingest(conn, [log_file], max_workers=1) == (2, 3)
+
+    assert [row["battery_health"] for row in health_history(conn, 0)] == [100.0, 79.0]
+    assert [row["event"] for row in transitions(conn)] == ["charging_disabled", "target_reached", "cleanup"]
+    assert machines(conn)[0]["machine"] == "mbp-lab-1"
+    assert machines(conn)[0]["cycle_count"] == 11
+
+
+def test_ingest_resumes_from_last_offset(tmp_path):
+    """Only new complete lines are read on the next ingest; a partial line waits"""
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, reading(T0, 95.0))
+    conn = open_store(tmp_path / "history.db")
+
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+    assert ingest(conn, [log_file], max_workers=1) == (0, 0)
+
+    append_log(log_file, reading(T0 + 60, 94.0))
+    with log_file.open("a") as f:
+        f.write('{"event": "battery_rea')
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+
+    with log_file.open("a") as f:
+        f.write(json.dumps(reading(T0 + 120, 93.0))[len('{"event": "battery_rea') :] + "\n")
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+    assert [row["battery_health"] for row in health_history(conn, 0)] == [95.0, 94.0, 93.0]
+
+
+def test_ingest_restarts_rotated_file(tmp_path):
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, reading(T0, 95.0), reading(T0 + 60, 94.0))
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [log_file], max_workers=1)
+
+    log_file.unlink()
+    append_log(log_file, reading(T0 + 120, 93.0))
+
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+
+
+def test_rotated_logs_belong_to_the_same_machine(tmp_path):
+    rotated = tmp_path / "mbp-lab-3.log.1"
+    live = tmp_path / "mbp-lab-3.log"
+    append_log(rotated, reading(T0, 95.0))
+    append_log(live, reading(T0 + 60, 94.0))
+    conn = open_store(tmp_path / "history.db")
+
+    ingest(conn, [rotated, live], max_workers=2)
+
+    assert [row["machine"] for row in machines(conn)] == ["mbp-lab-3"]
+    assert machine_name(Path("mbp-lab-3.log-20260101")) == "mbp-lab-3"
+    assert machine_name(Path("mbp.catalog.log")) == "mbp.catalog"
+    assert machine_name(Path("mbp-lab-3.txt")) == "mbp-lab-3"
+
+
+def test_ingest_resumes_copied_file_without_duplicates(tmp_path):
+    """rsync/scp replace the inode; the same first line means the same file, so only new lines are read"""
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, reading(T0, 95.0), reading(T0 + 60, 94.0))
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [log_file], max_workers=1)
+
+    refreshed = tmp_path / "mbp.log.tmp"
+    refreshed.write_bytes(log_file.read_bytes())
+    append_log(refreshed, reading(T0 + 120, 93.0))
+    refreshed.replace(log_file)
+
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+    assert len(health_history(conn, 0)) == 3
+    (hour,) = health_history(conn, HOUR)
+    assert hour["samples"] == 3
+
+
+def test_reingesting_stored_rows_is_ignored(tmp_path):
+    """Even a full re-read (e.g. the same log under a second path) neither duplicates rows nor rollups"""
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, reading(T0, 95.0), {"event": "cleanup", "timestamp": reading(T0, 95.0)["timestamp"]})
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [log_file], max_workers=1)
+
+    copy = tmp_path / "copy" / "mbp.log"
+    copy.parent.mkdir()
+    copy.write_bytes(log_file.read_bytes())
+
+    assert ingest(conn, [copy], max_workers=1) == (0, 0)
+    (hour,) = health_history(conn, HOUR)
+    assert hour["samples"] == 1
+
+
+def test_ingest_skips_malformed_events(tmp_path):
+    """A reading with a missing or bad field is skipped like a non-JSON line, and the offset still advances"""
+    log_file = tmp_path / "mbp.log"
+    missing = reading(T0, 95.0)
+    del missing["battery_percentage"]
+    append_log(
+        log_file,
+        missing,
+        reading(T0 + 60, "n/a"),
+        reading(T0 + 120, 94.0) | {"timestamp": "yesterday"},
+        reading(T0 + 180, 93.0),
+    )
+    conn = open_store(tmp_path / "history.db")
+
+    assert ingest(conn, [log_file], max_workers=1) == (1, 0)
+    assert ingest(conn, [log_file], max_workers=1) == (0, 0)
+    assert [row["battery_health"] for row in health_history(conn, 0)] == [93.0]
+
+
+def test_ingest_reads_large_files_in_chunks(tmp_path):
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, *(reading(T0 + i * 60, 90.0) for i in range(100)))
+    conn = open_store(tmp_path / "history.db")
+
+    assert ingest(conn, [log_file], max_workers=1, max_bytes=1000) == (100, 0)
+
+
+def test_rollups_and_min_health_filter(tmp_path):
+    """Minute and hour rollups aggregate across ingests; min_health filters on latest health"""
+    healthy = tmp_path / "healthy.log"
+    worn = tmp_path / "worn.log"
+    append_log(healthy, reading(T0, 90.0, 20.0), reading(T0 + 30, 88.0, 40.0))
+    append_log(worn, reading(T0, 84.0))
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [healthy, worn], max_workers=2)
+
+    append_log(healthy, reading(T0 + 90, 86.0, 60.0))
+    ingest(conn, [healthy, worn], max_workers=2)
+
+    minutes = health_history(conn, MINUTE, min_health=85)
+    assert [(row["machine"], row["ts"], row["samples"]) for row in minutes] == [
+        ("healthy", T0, 2),
+        ("healthy", T0 + 60, 1),
+    ]
+    assert minutes[0]["battery_health"] == 89.0
+    assert minutes[0]["percentage_max"] == 40.0
+
+    (hour,) = health_history(conn, HOUR, machine="healthy")
+    assert hour["samples"] == 3
+    assert hour["health_min"] == 86.0
+    assert hour["battery_health"] == 88.0
+
+    assert [row["machine"] for row in machines(conn, min_health=85)] == ["healthy"]
+
+
+def test_prune_applies_retention_per_resolution(tmp_path):
+    log_file = tmp_path / "mbp.log"
+    append_log(log_file, reading(T0, 95.0), reading(T0 + 10 * DAY, 94.0))
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [log_file], max_workers=1)
+
+    prune(conn, Retention(raw_days=1, minute_days=5, hour_days=None), now=T0 + 10 * DAY)
+
+    assert len(health_history(conn, 0)) == 1
+    assert len(health_history(conn, MINUTE)) == 1
+    assert len(health_history(conn, HOUR)) == 2
+
+
+def test_prune_keeps_transitions_past_raw_window(tmp_path):
+    """Transitions aren't rolled up, so they outlive raw readings unless given their own window"""
+    log_file = tmp_path / "mbp.log"
+    transition = {"event": "charging_disabled", "battery_percentage": 96.0}
+    append_log(
+        log_file,
+        transition | {"timestamp": reading(T0, 95.0)["timestamp"]},
+        transition | {"timestamp": reading(T0 + 10 * DAY, 95.0)["timestamp"]},
+    )
+    conn = open_store(tmp_path / "history.db")
+    ingest(conn, [log_file], max_workers=1)
+
+    prune(conn, Retention(raw_days=1), now=T0 + 10 * DAY)
+    assert len(transitions(conn)) == 2
+
+    prune(conn, Retention(raw_days=1, transition_days=5), now=T0 + 10 * DAY)
+    assert len(transitions(conn)) == 1
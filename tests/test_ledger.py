@@ -0,0 +1,159 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import LEGACY_KEYS
+
+from batterytool.ledger import EnergyLedger
+from batterytool.logging import setup_logging
+from batterytool.loop import legacy_loop
+from batterytool.main import main
+
+
+def info(current, max_capacity=1000, cycle_count=10, amperage=None):
+    return SimpleNamespace(
+        current_capacity=current,
+        max_capacity=max_capacity,
+        cycle_count=cycle_count,
+        amperage=amperage or 0,
+        has_amperage=amperage is not None,
+    )
+
+
+def test_counts_capacity_deltas_without_amperage(tmp_path):
+    ledger = EnergyLedger(tmp_path / "ledger.json")
+
+    ledger.record(info(800), 100.0, now=0)
+    ledger.record(info(600), 100.0, now=60)
+    summary = ledger.record(info(700), 100.0, now=120)
+
+    assert summary["mah_discharged"] == 200
+    assert summary["mah_charged"] == 100
+    assert summary["equivalent_full_cycles"] == pytest.approx(0.2)
+
+
+def test_integrates_amperage_when_available(tmp_path):
+    """Coulomb counting: the average of both readings' current over the time between them"""
+    ledger = EnergyLedger(tmp_path / "ledger.json")
+
+    ledger.record(info(800, amperage=-1000), 100.0, now=0)
+    summary = ledger.record(info(799, amperage=-2000), 100.0, now=1800)
+
+    assert summary["mah_discharged"] == pytest.approx(750)
+    assert summary["equivalent_full_cycles"] == pytest.approx(0.75)
+
+
+def test_zero_amperage_is_a_reading(tmp_path):
+    """0 mA on AC with charging disabled means nothing moved, not that amperage is missing"""
+    ledger = EnergyLedger(tmp_path / "ledger.json")
+
+    ledger.record(info(800, amperage=0), 100.0, now=0)
+    summary = ledger.record(info(790, amperage=0), 100.0, now=60)
+
+    assert summary["mah_discharged"] == 0
+
+
+def test_falls_back_to_capacity_across_sleep(tmp_path):
+    """A gap far past the polling interval means the machine slept, so the current in between is unknown"""
+    ledger = EnergyLedger(tmp_path / "ledger.json", interval=60)
+
+    ledger.record(info(800, amperage=-1000), 100.0, now=0)
+    asleep = ledger.record(info(700, amperage=-1000), 100.0, now=8 * 3600)
+    awake = ledger.record(info(699, amperage=-1000), 100.0, now=8 * 3600 + 36)
+
+    assert asleep["mah_discharged"] == 100
+    assert awake["mah_discharged"] == pytest.approx(110)
+
+
+def test_wear_per_equivalent_cycle_and_cycle_count(tmp_path):
+    ledger = EnergyLedger(tmp_path / "ledger.json")
+
+    ledger.record(info(1000, cycle_count=10), 90.0, now=0)
+    summary = ledger.record(info(0, cycle_count=11), 89.5, now=60)
+
+    assert summary["equivalent_full_cycles"] == 1
+    assert summary["wear_per_equivalent_cycle"] == pytest.approx(0.5)
+    assert summary["cycle_count_delta"] == 1
+
+
+def test_totals_persist_across_restarts(tmp_path):
+    """Reloaded totals carry on, and the gap while the tool was stopped isn't counted"""
+    path = tmp_path / "ledger.json"
+    first = EnergyLedger.load(path)
+    first.record(info(800), 100.0, now=0)
+    first.record(info(600), 100.0, now=60)
+
+    second = EnergyLedger.load(path)
+    second.record(info(900), 99.0, now=0)
+    summary = second.record(info(850), 99.0, now=60)
+
+    assert summary["mah_discharged"] == 250
+    assert summary["mah_charged"] == 0
+    assert json.loads(path.read_text())["start_health"] == 100.0
+
+
+@pytest.mark.parametrize(
+    "contents",
+    ["", "{not json", "[]", json.dumps({"mah_charged": 10.0})],
+    ids=["empty", "corrupt", "not-an-object", "older-schema"],
+)
+def test_unreadable_ledger_starts_fresh(hw, tmp_path, capfd, contents):
+    """A ledger file that can't be loaded is logged, replaced, and the loop still runs"""
+    hw.set_keys(LEGACY_KEYS)
+    hw.script((96, 100, 100, 10, 1, 1), (79, 79, 100, 11, 1, 1))
+    path = tmp_path / "ledger.json"
+    path.write_text(contents)
+    logger = setup_logging()
+
+    ledger = EnergyLedger.load(path)
+    legacy_loop(79, 95, 5, interval=0, logger=logger, ledger=ledger)
+
+    events = [json.loads(line) for line in capfd.readouterr().err.strip().splitlines()]
+    (failed,) = [event for event in events if event["event"] == "ledger_failed"]
+    assert str(path) in failed["message"]
+    assert "target_reached" in [event["event"] for event in events]
+    assert json.loads(path.read_text())["start_health"] == 100.0
+
+
+def test_loop_reports_ledger_in_readings(hw, tmp_path, capfd):
+    hw.set_keys(LEGACY_KEYS)
+    hw.script((90, 100, 100, 10, 0, 1), (60, 100, 100, 10, 0, 1, -1500), (79, 79, 100, 11, 1, 1))
+    path = tmp_path / "ledger.json"
+
+    legacy_loop(79, 95, 5, interval=0, logger=setup_logging(), ledger=EnergyLedger.load(path))
+
+    events = [json.loads(line) for line in capfd.readouterr().err.strip().splitlines()]
+    readings = [event for event in events if event["event"] == "battery_reading"]
+    assert readings[1]["mah_discharged"] == 30
+    assert readings[1]["equivalent_full_cycles"] == pytest.approx(0.3)
+    assert json.loads(path.read_text())["mah_discharged"] == readings[-1]["mah_discharged"]
+
+
+@pytest.mark.apple_silicon
+def test_cli_status_includes_ledger_totals(hw, tmp_path, capfd):
+    path = tmp_path / "ledger.json"
+    ledger = EnergyLedger(path)
+    ledger.record(info(800), 100.0, now=0)
+    ledger.record(info(600), 100.0, now=60)
+    hw.script((80, 100, 100, 10, 1, 1))
+
+    main(status=True, ledger_file=path)
+
+    events = [json.loads(line) for line in capfd.readouterr().err.strip().splitlines()]
+    (status,) = [event for event in events if event["event"] == "battery_status"]
+    assert status["mah_discharged"] == 200
+
+
+def test_failing_ledger_never_stops_the_loop(hw, tmp_path, capfd):
+    """A ledger that can't be saved is logged on every reading, and the run still reaches target health"""
+    hw.set_keys(LEGACY_KEYS)
+    hw.script((96, 100, 100, 10, 1, 1), (79, 79, 100, 11, 1, 1))
+    unwritable = tmp_path / "missing-dir" / "ledger.json"
+
+    legacy_loop(79, 95, 5, interval=0, logger=setup_logging(), ledger=EnergyLedger.load(unwritable))
+
+    events = [json.loads(line)["event"] for line in capfd.readouterr().err.strip().splitlines()]
+    assert events.count("ledger_failed") == 2
+    assert "target_reached" in events
+    assert "unexpected_error" not in events
@@ -168,6 +168,18 @@ def test_logs_to_file(hw, tmp_path):
         assert "event" in event
 
 
+def test_setup_logging_twice_does_not_duplicate_events(hw, capfd):
+    """Handlers from an earlier setup_logging call are replaced, not stacked"""
+    hw.set_keys(LEGACY_KEYS)
+    hw.script(TARGET_ROW)
+    setup_logging()
+
+    run_legacy()
+
+    readings = [e for e in read_stderr_json(capfd) if e["event"] == "battery_reading"]
+    assert len(readings) == 1
+
+
 # -- CLI (main.py) --
 
 
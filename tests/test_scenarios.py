@@ -0,0 +1,123 @@
+import importlib
+import itertools
+import json
+
+from tests.scenarios import generate_scenarios
+
+from batterytool.logging import setup_logging
+
+TOGGLES = ("charging_disabled", "charging_enabled")
+HOOKS = {"fetch": "batterytool.loop.fetch_battery_info", "sleep": "time.sleep"}
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize over the seeded scenarios; every xdist worker collects the same list"""
+    if "scenario" in metafunc.fixturenames:
+        config = metafunc.config
+        scenarios = generate_scenarios(config.getoption("scenario_seed"), config.getoption("scenarios"))
+        metafunc.parametrize("scenario", scenarios, ids=[s.id for s in scenarios])
+
+
+def raise_at(monkeypatch, interrupt):
+    """Make the loop's poll-th fetch or sleep raise, as Ctrl-C or a failing backend would"""
+    target = HOOKS[interrupt.hook]
+    module, name = target.rsplit(".", 1)
+    original = getattr(importlib.import_module(module), name)
+    calls = itertools.count()
+
+    def hook(*args):
+        if next(calls) == interrupt.poll:
+            raise interrupt.exception("scripted interrupt")
+        return original(*args)
+
+    monkeypatch.setattr(target, hook)
+
+
+def test_scenario_invariants(scenario, hw, capfd, monkeypatch):
+    """Run one randomized script through the real loop and check it against the invariants"""
+    layout = scenario.layout
+    hw.set_keys(layout.keys)
+    hw.script(*scenario.rows)
+    if scenario.interrupt is not None:
+        raise_at(monkeypatch, scenario.interrupt)
+
+    layout.loop(
+        target_health=scenario.target_health,
+        max_charge=scenario.max_charge,
+        min_charge=scenario.min_charge,
+        interval=0,
+        logger=setup_logging(),
+    )
+
+    events = [json.loads(line) for line in capfd.readouterr().err.strip().splitlines()]
+    toggles = check_events(scenario, events)
+
+    # Every logged toggle hit the SMC, and charging is always re-enabled on exit
+    expected = [layout.disable if toggle == "charging_disabled" else layout.enable for toggle in toggles]
+    assert hw.writes() == sum(expected, ()) + layout.enable
+
+
+def check_events(scenario, events):
+    """Replay the log against the thresholds and return the toggles in order
+
+    The expected percentage and health come from the scripted rows, not from
+    the log, so a bug in how the loop derives them can't hide. Asserts that no
+    threshold crossing goes unanswered before the next reading, that the loop
+    never toggles twice without a reading in between, and that it logs one
+    reading per valid row it consumed
+    """
+    charging_enabled = True
+    due = None
+    toggled = False
+    toggles = []
+    readings = 0
+
+    for event in events:
+        name = event["event"]
+        if name == "battery_reading":
+            assert due is None, f"missed {due} before the next reading"
+            assert event["charging_enabled"] == charging_enabled
+            current, max_cap, design, *_ = scenario.rows[readings]
+            percentage = current / max_cap * 100
+            health = max_cap / design * 100
+            assert event["battery_percentage"] == percentage
+            assert event["battery_health"] == health
+            readings += 1
+            toggled = False
+            if health <= scenario.target_health:
+                continue
+            if percentage > scenario.max_charge and charging_enabled:
+                due = "charging_disabled"
+            elif percentage < scenario.min_charge and not charging_enabled:
+                due = "charging_enabled"
+        elif name in TOGGLES:
+            assert not toggled, "toggled twice without a reading in between"
+            assert name == due, f"unexpected {name}"
+            charging_enabled = name == "charging_enabled"
+            due = None
+            toggled = True
+            toggles.append(name)
+
+    assert due is None, f"missed {due} before exit"
+    assert readings == expected_readings(scenario)
+    if scenario.interrupt is not None:
+        exit_event = "keyboard_interrupt" if scenario.interrupt.exception is KeyboardInterrupt else "unexpected_error"
+        assert events[-2]["event"] == exit_event
+    assert events[-1]["event"] == "cleanup"
+    return toggles
+
+
+def expected_readings(scenario):
+    """Readings the loop should log: one per row up to the row that ends the run,
+    which is logged if it reaches target health and dropped if it is invalid.
+    An interrupted run stops before its poll-th read, or right after it when
+    the sleep raises"""
+    interrupt = scenario.interrupt
+    if interrupt is not None:
+        return interrupt.poll + 1 if interrupt.hook == "sleep" else interrupt.poll
+    for index, (_, max_cap, design, *_) in enumerate(scenario.rows):
+        if max_cap <= 0 or design <= 0:
+            return index
+        if max_cap / design * 100 <= scenario.target_health:
+            return index + 1
+    raise AssertionError("script never ends the loop")
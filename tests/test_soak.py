@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+from tests.scenarios import LAYOUTS
+from tests.soak import run_soak
+
+from batterytool.logging import setup_logging
+
+# One charge cycle, replayed for the whole run: every other poll crosses a
+# threshold and toggles, the rest sit mid-range
+SOAK_CYCLE = (
+    (96, 100, 100, 10, 1, 1),
+    (50, 100, 100, 10, 0, 1),
+    (4, 100, 100, 10, 0, 1),
+    (50, 100, 100, 10, 1, 1),
+)
+WARMUP_POLLS = 1000
+
+# Budgets the hot loop must stay under
+GROWTH_BYTES_PER_POLL = 1
+ALLOCATIONS_PER_POLL = 512
+MAX_ALLOCATIONS_PER_POLL = 1024
+PEAK_BYTES_PER_POLL = 32 * 1024
+MAX_PEAK_BYTES_PER_POLL = 64 * 1024
+RSS_GROWTH_BYTES = 16 * 1024 * 1024
+
+
+@pytest.mark.soak
+@pytest.mark.parametrize("layout", LAYOUTS, ids=[layout.name for layout in LAYOUTS])
+def test_soak_memory_stays_flat(layout, hw, monkeypatch, request, record_property):
+    """Memory stays flat over a long unattended run, and the per-poll allocation cost stays bounded"""
+    polls = request.config.getoption("soak_iterations")
+    hw.set_keys(layout.keys)
+    hw.script(*SOAK_CYCLE)
+
+    # Render every event as usual, but don't spend the run writing to the capture file
+    devnull = open(os.devnull, "w")  # noqa: SIM115
+    request.addfinalizer(devnull.close)
+    monkeypatch.setattr(sys, "stderr", devnull)
+
+    report = run_soak(
+        layout.loop,
+        polls=polls,
+        warmup=WARMUP_POLLS,
+        monkeypatch=monkeypatch,
+        rewind=hw.rewind,
+        period=len(SOAK_CYCLE),
+        target_health=79,
+        max_charge=95,
+        min_charge=5,
+        interval=60,
+        logger=setup_logging(),
+    )
+
+    # Printed by conftest's pytest_terminal_summary, on the xdist controller
+    record_property("soak", report.summary())
+
+    growth = "\n".join(report.top_growth)
+    assert report.growth_bytes_per_poll <= GROWTH_BYTES_PER_POLL, f"memory grows per poll:\n{growth}"
+    assert report.mean_allocations_per_poll <= ALLOCATIONS_PER_POLL, report.summary()
+    assert report.max_allocations_per_poll <= MAX_ALLOCATIONS_PER_POLL, report.summary()
+    assert report.mean_peak_bytes_per_poll <= PEAK_BYTES_PER_POLL, report.summary()
+    assert report.max_peak_bytes_per_poll <= MAX_PEAK_BYTES_PER_POLL, report.summary()
+    assert report.rss_growth_bytes <= RSS_GROWTH_BYTES, report.summary()
+    # Both toggles ran once per cycle through the measured polls too, not only during warmup
+    writes = hw.writes()
+    cycles = (WARMUP_POLLS + polls) // len(SOAK_CYCLE)
+    assert writes.count(layout.disable[0]) >= cycles
+    assert writes.count(layout.enable[0]) >= cycles
+    # The run ended through the loop's own cleanup path
+    assert writes[-len(layout.enable) :] == layout.enable
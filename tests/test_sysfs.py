@@ -0,0 +1,210 @@
+import json
+import os
+
+import pytest
+
+from batterytool import battery
+from batterytool.logging import setup_logging
+from batterytool.loop import legacy_loop
+from batterytool.sysfs import SysfsFFI, SysfsLib
+
+
+@pytest.fixture
+def lib(sysfs):
+    lib = SysfsLib(sysfs.root)
+    yield lib
+    if lib.battery is not None:
+        lib.battery.close()
+
+
+@pytest.fixture
+def sysfs_backend(lib, monkeypatch):
+    """Bind the sysfs backend in battery.py, as it is on a Linux machine"""
+    monkeypatch.setattr(battery, "lib", lib)
+    monkeypatch.setattr(battery, "ffi", SysfsFFI())
+    return lib
+
+
+def test_fetch_battery_info_reports_mah(sysfs, lib):
+    sysfs.battery(charge_now=4321000, charge_full=5000000, charge_full_design=6000000, cycle_count=42)
+    sysfs.supply("AC", type="Mains", online=1)
+
+    info = lib.FetchBatteryInfo()
+
+    assert (info.current_capacity, info.max_capacity, info.design_capacity) == (4321, 5000, 6000)
+    assert info.cycle_count == 42
+    assert info.is_charging is True
+    assert info.is_plugged_in is True
+    assert info.has_amperage is False
+
+
+def test_polls_held_descriptors_without_reopening(sysfs, lib):
+    """Discovery opens the files once; later polls pread the same fds and see in-place updates"""
+    sysfs.battery(charge_now=50000, status="Charging")
+    sysfs.supply("AC", type="Mains", online=1)
+    lib.FetchBatteryInfo()
+    open_fds = len(os.listdir("/dev/fd"))
+
+    sysfs.battery(charge_now=40000, status="Discharging")
+    sysfs.supply("AC", online=0)
+    info = lib.FetchBatteryInfo()
+
+    assert len(os.listdir("/dev/fd")) == open_fds
+    assert info.current_capacity == 40
+    assert info.is_charging is False
+    assert info.is_plugged_in is False
+
+
+def test_discovery_skips_non_batteries(sysfs, lib):
+    sysfs.supply("AC", type="Mains", online=1)
+    sysfs.supply("hidpp_battery_0", type="Battery", capacity=80)
+    sysfs.battery("BAT1", charge_now=10000)
+
+    assert lib.FetchBatteryInfo().current_capacity == 10
+
+
+def test_plugged_in_falls_back_to_status_without_mains(sysfs, lib):
+    sysfs.battery(status="Not charging")
+
+    info = lib.FetchBatteryInfo()
+
+    assert info.is_charging is False
+    assert info.is_plugged_in is True
+
+
+def test_no_battery_returns_invalid_data(lib):
+    info = lib.FetchBatteryInfo()
+
+    assert info.max_capacity == 0
+    assert lib.SmcWriteKey(b"CH0B", b"02") == -1
+
+
+def test_legacy_keys_map_to_charge_controls(sysfs, sysfs_backend):
+    sysfs.battery()
+
+    battery.legacy_disable_charging()
+    assert sysfs.read("BAT0", "charge_control_end_threshold") == "1"
+    assert sysfs.read("BAT0", "charge_behaviour") == "force-discharge"
+
+    battery.legacy_enable_charging()
+    assert sysfs.read("BAT0", "charge_control_end_threshold") == "100"
+    assert sysfs.read("BAT0", "charge_behaviour") == "auto"
+
+
+def test_never_looks_like_tahoe(sysfs, sysfs_backend):
+    """Tahoe keys have no sysfs equivalent, so the legacy loop is picked"""
+    sysfs.battery()
+
+    assert battery.is_tahoe() is False
+    assert sysfs_backend.SmcWriteKey(b"CHTE", b"01000000") == -1
+
+
+def test_missing_charge_behaviour_fails_like_unknown_key(sysfs, lib):
+    sysfs.battery(controls=("charge_control_end_threshold",))
+
+    assert lib.SmcReadKey(b"CH0I", bytearray(32), 32) == -1
+    assert lib.SmcWriteKey(b"CH0I", b"01") == -1
+    assert lib.SmcWriteKey(b"CH0B", b"02") == 0
+
+
+def test_legacy_loop_runs_unchanged_on_sysfs(sysfs, sysfs_backend):
+    """Loop exits at target health and the finally block restores charging via sysfs"""
+    sysfs.battery(charge_now=79000, charge_full=79000, charge_full_design=100000, charge_control_end_threshold=1)
+
+    legacy_loop(target_health=79, max_charge=95, min_charge=5, interval=0, logger=setup_logging())
+
+    assert sysfs.read("BAT0", "charge_control_end_threshold") == "100"
+    assert sysfs.read("BAT0", "charge_behaviour") == "auto"
+
+
+def test_amperage_is_signed_by_status(sysfs, lib):
+    """current_now is usually unsigned; discharging reads negative like IOKit's Amperage"""
+    sysfs.battery(current_now=1500000, status="Discharging")
+
+    assert lib.FetchBatteryInfo().amperage == -1500
+    assert lib.FetchBatteryInfo().has_amperage is True
+
+    sysfs.battery(current_now=1500000, status="Charging")
+    assert lib.FetchBatteryInfo().amperage == 1500
+
+
+def test_energy_battery_reports_mah_at_design_voltage(sysfs, lib):
+    """Drivers that report uWh are converted at voltage_min_design, so health matches the uWh ratio"""
+    sysfs.supply(
+        "BAT0",
+        type="Battery",
+        energy_now=23100000,
+        energy_full=46200000,
+        energy_full_design=57750000,
+        voltage_min_design=11550000,
+        power_now=11550000,
+        status="Discharging",
+        charge_control_end_threshold=100,
+    )
+
+    info = lib.FetchBatteryInfo()
+
+    assert (info.current_capacity, info.max_capacity, info.design_capacity) == (2000, 4000, 5000)
+    assert info.amperage == -1000
+
+
+def test_missing_cycle_count_reads_as_zero(sysfs, lib):
+    sysfs.battery()
+    (sysfs.root / "BAT0" / "cycle_count").unlink()
+
+    info = lib.FetchBatteryInfo()
+
+    assert info.max_capacity == 100
+    assert info.cycle_count == 0
+
+
+def test_battery_missing_required_file_is_logged_and_skipped(sysfs, lib, capfd):
+    """A battery without a required file is no battery, and the error names the file"""
+    sysfs.battery()
+    (sysfs.root / "BAT0" / "charge_now").unlink()
+    setup_logging()
+
+    assert lib.FetchBatteryInfo().max_capacity == 0
+
+    (event,) = [json.loads(line) for line in capfd.readouterr().err.splitlines()]
+    assert event["event"] == "battery_unsupported"
+    assert event["missing"] == ["charge_now"]
+    assert event["path"].endswith("BAT0")
+
+
+def test_battery_without_charge_threshold_is_unsupported(sysfs, lib, capfd):
+    """Without charge_control_end_threshold the loop couldn't stop charging, so it must not start"""
+    sysfs.battery(controls=("charge_behaviour",))
+    setup_logging()
+
+    assert lib.FetchBatteryInfo().max_capacity == 0
+    assert lib.SmcWriteKey(b"CH0B", b"02") == -1
+
+    (event,) = [json.loads(line) for line in capfd.readouterr().err.splitlines()]
+    assert event["missing"] == ["charge_control_end_threshold"]
+
+
+def test_rejected_write_is_logged_with_attribute_and_value(sysfs, lib, capfd):
+    """Drivers reject thresholds they don't support (dell-laptop's minimum is 55); that must be diagnosable"""
+    sysfs.battery()
+    lib.FetchBatteryInfo()
+    # The kernel answers an unsupported value with EINVAL; a directory fails the open the same way
+    threshold = sysfs.root / "BAT0" / "charge_control_end_threshold"
+    threshold.unlink()
+    threshold.mkdir()
+    setup_logging()
+
+    assert lib.SmcWriteKey(b"CH0B", b"02") == -1
+
+    (event,) = [json.loads(line) for line in capfd.readouterr().err.splitlines()]
+    assert event["event"] == "charge_control_rejected"
+    assert event["path"].endswith("BAT0/charge_control_end_threshold")
+    assert event["value"] == "1"
+
+
+def test_missing_optional_control_is_not_logged(sysfs, lib, capfd):
+    sysfs.battery(controls=("charge_control_end_threshold",))
+    setup_logging()
+
+    assert lib.SmcWriteKey(b"CH0I", b"01") == -1
+    assert capfd.readouterr().err == ""